@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+Topic first 內容策略產生器 - 多人同時使用的負載測試工具
+
+以 Streamlit 的 headless AppTest 模擬 N 位使用者，各自走完
+「上傳 Persona CSV → 執行策略分析 → 生成初步策略 → 生成整合行銷漏斗」的完整流程。
+上傳步驟會經過 App 實際的上傳處理 (load_persona_df 與格式分類)，因此讀取與解析的成本也會計入。
+AppTest 無法在同一個行程中多執行緒並行，因此以多個子行程 (worker) 模擬同時上線的使用者。
+每個 worker 啟動時先以少量 Persona 預熱一次完整流程，匯入套件的固定成本會另外列出，不計入單一 session 的 RSS。
+Gemini API 會被替換成本地的假後端 (可設定延遲)，因此不需要 API 金鑰，也不會消耗配額。
+
+使用方式:
+    python load_test.py --users 20 --concurrency 5 --personas 2000 --latency-ms 300
+"""
+import argparse
+import ctypes
+import gc
+import hashlib
+import io
+import os
+import multiprocessing
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import google.generativeai as genai
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "strategy_app.py")
+EMBEDDING_DIM = 768
+STEPS = ["load", "match", "strategy", "funnel"]
+WARMUP_PERSONAS = 20
+
+
+# --- 本地假後端 ---
+
+def fake_embedding(text):
+    """依文字內容產生固定的假語意向量"""
+    seed = int(hashlib.md5(text.encode('utf-8')).hexdigest()[:8], 16)
+    return np.random.default_rng(seed).normal(size=EMBEDDING_DIM).tolist()
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeBackend:
+    """取代 google.generativeai 的本地假後端，以 sleep 模擬網路與生成延遲"""
+
+    def __init__(self, latency_s):
+        self.latency_s = latency_s
+
+    def install(self):
+        backend = self
+
+        class FakeGenerativeModel:
+            def __init__(self, model_name):
+                self.model_name = model_name
+
+            def generate_content(self, prompt):
+                time.sleep(backend.latency_s)
+                return FakeResponse(backend.fake_generation(prompt))
+
+        genai.configure = lambda **kwargs: None
+        genai.embed_content = self.embed_content
+        genai.GenerativeModel = FakeGenerativeModel
+
+    def embed_content(self, model, content, task_type=None):
+        time.sleep(self.latency_s / 4)
+        if isinstance(content, list):
+            return {'embedding': [fake_embedding(text) for text in content]}
+        return {'embedding': fake_embedding(content)}
+
+    def fake_generation(self, prompt):
+        # 初步策略需符合 App 解析的段落格式，漏斗各階段則回傳簡短文字即可
+        if "內容策略顧問" in prompt and "數位行銷策略總監" not in prompt:
+            names = [line.split(":", 1)[1].strip() for line in prompt.splitlines() if line.startswith("### 人物誌 (Persona):")]
+            return "\n\n---\n\n".join(
+                f"### **針對「{name}」的內容策略**\n\n**1. 主題與 Persona 連結分析:** 測試內容。\n\n"
+                f"* **點子一：**\n    * **主題/標題方向:** {name} 的入門指南\n    * **建議格式:** Podcast\n    * **理由:** 測試理由"
+                for name in names
+            )
+        return "### 測試階段\n測試內容。"
+
+
+# --- 測試資料 ---
+
+def build_persona_library(n_personas, seed):
+    """產生含語意向量的假 Persona CSV (與本地端腳本輸出的檔案格式相同)"""
+    rng = np.random.default_rng(seed)
+    keyword_pool = np.array(["兒童理財", "零用錢", "親子溝通", "儲蓄習慣", "投資入門", "育兒", "睡眠", "學習規劃"])
+    format_pool = np.array(["Podcast", "IG圖文卡", "YouTube 影片", "深度文章", "電子報"])
+    keywords = [",".join(rng.choice(keyword_pool, 3, replace=False)) for _ in range(n_personas)]
+    formats = [",".join(rng.choice(format_pool, 2, replace=False)) for _ in range(n_personas)]
+    embeddings = rng.normal(size=(n_personas, EMBEDDING_DIM)).round(6)
+    df = pd.DataFrame({
+        'persona_name': [f"測試人物誌 {seed}-{i}" for i in range(n_personas)],
+        'summary': [f"測試摘要 {i}" for i in range(n_personas)],
+        'goals': [f"測試目標 {i}" for i in range(n_personas)],
+        'pain_points': [f"關於{k.split(',')[0]}的困擾" for k in keywords],
+        'keywords': keywords,
+        'preferred_formats': formats,
+        'embeddings': [str(row.tolist()) for row in embeddings],
+    })
+    return df.to_csv(index=False).encode('utf-8')
+
+class FakeUploadedFile(io.BytesIO):
+    """模擬 st.file_uploader 回傳的上傳檔案 (AppTest 不支援上傳元件)"""
+
+    def __init__(self, data, file_id):
+        super().__init__(data)
+        self.file_id = file_id
+
+UPLOADED_FILES = {}
+
+def fake_file_uploader(label, **kwargs):
+    return UPLOADED_FILES.get(kwargs.get('key'))
+
+
+# --- 模擬使用者 ---
+
+def current_rss_mb():
+    """目前行程的 RSS (MB)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+def peak_rss_mb():
+    """目前行程的 RSS 峰值 (MB，Linux 的 ru_maxrss 單位為 KB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def find_widget(widgets, label_text):
+    for widget in widgets:
+        if label_text in widget.label:
+            return widget
+    raise LookupError(f"找不到元件「{label_text}」")
+
+class RssSampler:
+    """在背景定期取樣目前行程的 RSS，記錄期間內的峰值"""
+
+    def __init__(self, interval_s=0.05):
+        self.interval_s = interval_s
+        self.peak_mb = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval_s):
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+try:
+    LIBC = ctypes.CDLL("libc.so.6")
+except OSError:
+    LIBC = None
+
+def release_memory():
+    """回收垃圾並將閒置的記憶體還給作業系統，讓前後兩次 RSS 的差值只反映仍在使用的記憶體"""
+    gc.collect()
+    pa.default_memory_pool().release_unused()
+    if LIBC is not None and hasattr(LIBC, 'malloc_trim'):
+        LIBC.malloc_trim(0)
+
+WORKER_STATS = {}
+
+@contextmanager
+def preserve_main_module():
+    # AppTest 執行腳本時會替換 __main__，不還原的話 worker 之後無法反序列化新的任務
+    main_module = sys.modules['__main__']
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main_module
+
+def init_worker(args):
+    """啟動 worker：安裝假後端，並以少量 Persona 先跑一次完整流程，讓匯入與首次執行的成本不計入之後的 session"""
+    FakeBackend(args.latency_ms / 1000).install()
+    st.file_uploader = fake_file_uploader
+    WORKER_STATS['startup_rss_mb'] = current_rss_mb()
+    try:
+        with preserve_main_module():
+            _run_session_steps("warmup", args, {}, build_persona_library(WARMUP_PERSONAS, seed=0))
+    finally:
+        UPLOADED_FILES.clear()
+    release_memory()
+    WORKER_STATS['warm_rss_mb'] = current_rss_mb()
+
+def run_session(user_id, args):
+    """模擬一位使用者完成一次完整流程，回傳各步驟耗時 (秒) 與記憶體用量 (MB)"""
+    csv_data = build_persona_library(args.personas, seed=user_id)
+    # 先釋放上一個 session 留下的記憶體，避免在本次 session 期間才還給作業系統而讓 RSS 增量失真
+    release_memory()
+    timings = {'started_at': time.time()}
+    baseline_rss = current_rss_mb()
+    try:
+        with preserve_main_module(), RssSampler() as sampler:
+            at = _run_session_steps(user_id, args, timings, csv_data)
+    finally:
+        UPLOADED_FILES.clear()
+    timings['finished_at'] = time.time()
+    timings['session'] = sum(timings[step] for step in STEPS)
+    # session 仍存在時 (Persona 資料、索引與各種快取都還在 session state 中) 的常駐記憶體
+    release_memory()
+    timings['rss_mb'] = current_rss_mb() - baseline_rss
+    del at
+    timings['peak_rss_mb'] = sampler.peak_mb - baseline_rss
+    timings.update(WORKER_STATS)
+    return timings
+
+def _run_session_steps(user_id, args, timings, csv_data):
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    UPLOADED_FILES['persona_uploader'] = FakeUploadedFile(csv_data, file_id=f"personas-{user_id}")
+    start = time.perf_counter()
+    at.run()
+    timings['load'] = time.perf_counter() - start
+    if not any("成功載入" in message.value for message in at.sidebar.success):
+        raise RuntimeError("Persona 上傳失敗: " + "; ".join(str(e.value) for e in at.sidebar.error))
+
+    find_widget(at.sidebar.text_input, "API 金鑰").input("fake-api-key")
+    find_widget(at.sidebar.text_input, "核心主題").input(args.topic)
+
+    start = time.perf_counter()
+    find_widget(at.sidebar.button, "執行策略分析").click().run()
+    timings['match'] = time.perf_counter() - start
+
+    for checkbox in at.checkbox[:args.selected]:
+        checkbox.check()
+    at.run()
+    start = time.perf_counter()
+    find_widget(at.button, "初步策略").click().run()
+    timings['strategy'] = time.perf_counter() - start
+
+    find_widget(at.text_input, "產品/服務名稱").input("測試產品")
+    find_widget(at.text_input, "目標網址").input("https://example.com")
+    start = time.perf_counter()
+    find_widget(at.button, "漏斗策略").click().run()
+    timings['funnel'] = time.perf_counter() - start
+
+    if at.exception or at.error:
+        messages = [e.value for e in at.exception] + [e.value for e in at.error]
+        raise RuntimeError("; ".join(str(m) for m in messages))
+    return at
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Topic first 內容策略產生器負載測試")
+    parser.add_argument("--users", type=int, default=10, help="模擬的使用者 (session) 總數")
+    parser.add_argument("--concurrency", type=int, default=5, help="同時進行中的 session 數")
+    parser.add_argument("--personas", type=int, default=1000, help="每個 session 的 Persona 筆數")
+    parser.add_argument("--selected", type=int, default=3, help="每個 session 勾選的 Persona 數")
+    parser.add_argument("--latency-ms", type=float, default=200, help="假後端每次生成的延遲 (毫秒)")
+    parser.add_argument("--topic", default="兒童理財教育")
+    parser.add_argument("--timeout", type=float, default=120, help="單一步驟的逾時秒數")
+    args = parser.parse_args()
+
+    results, errors = [], []
+    # worker 重複使用，每個 session 都在已預熱的行程中執行，與實際伺服器的情況相近
+    with ProcessPoolExecutor(max_workers=args.concurrency, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_worker, initargs=(args,)) as executor:
+        futures = [executor.submit(run_session, user_id, args) for user_id in range(args.users)]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors.append(e)
+
+    print(f"使用者: {args.users}  同時進行: {args.concurrency}  Persona 筆數: {args.personas}  假後端延遲: {args.latency_ms:.0f} ms")
+    print(f"成功: {len(results)}  失敗: {len(errors)}")
+    for error in errors[:5]:
+        print(f"  - {error!r}")
+    if results:
+        timings = pd.DataFrame(results)
+        print()
+        print(f"{'步驟':<10}{'p50 (s)':>10}{'p95 (s)':>10}{'max (s)':>10}")
+        for step in STEPS + ['session']:
+            p50, p95 = np.percentile(timings[step], [50, 95])
+            print(f"{step:<10}{p50:>10.3f}{p95:>10.3f}{timings[step].max():>10.3f}")
+        # 吞吐量只以 session 實際執行的時間區間計算，不含 worker 啟動與預熱
+        active_time = timings['finished_at'].max() - timings['started_at'].min()
+        print()
+        print(f"吞吐量: {len(results) / active_time:.2f} sessions/s (session 執行區間 {active_time:.1f} s)")
+        print()
+        print(f"每個 worker 的固定成本 (匯入套件與預熱 App): {timings['warm_rss_mb'].median():.0f} MB "
+              f"(其中 App 匯入與首次執行 {(timings['warm_rss_mb'] - timings['startup_rss_mb']).median():.0f} MB)")
+        print(f"每個 session 常駐的 RSS (含 Persona 資料、索引與快取): p50 {timings['rss_mb'].median():.1f} MB，"
+              f"執行期間峰值 p95 {np.percentile(timings['peak_rss_mb'], 95):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Persona DataFrame 記憶體用量報告
+
+產生一份大型的假 Persona 資料庫 (預設 50 萬筆)，比較原本的讀取方式
+(object 字串 + 額外儲存 embedding_text 欄位) 與 persona_data.load_persona_df 的記憶體用量。
+
+使用方式:
+    python memory_report.py --rows 500000
+    python memory_report.py --rows 100000 --embedding-dim 768
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from persona_data import PERSONA_COLUMNS, load_persona_df
+
+SUMMARY_POOL = ["家有幼兒的新手父母，對孩子的金錢觀念養成感到焦慮", "國小老師，希望在課堂中融入理財教育",
+                "雙薪家庭家長，想找到兼顧工作與親子教育的方法", "兒童心理諮商師，關注孩子的情緒與習慣養成"]
+GOALS_POOL = ["讓孩子理解儲蓄與消費的差別，建立正確的零用錢觀念", "找到適合不同年齡層的教材與活動",
+              "在忙碌生活中找到可持續的親子互動方式"]
+PAIN_POOL = ["資訊過載但不知如何篩選，擔心自己做得不夠好", "缺乏系統化的教材，孩子容易失去興趣",
+             "工作繁忙，沒有時間研究合適的方法"]
+KEYWORD_POOL = ["兒童理財", "零用錢", "親子溝通", "儲蓄習慣", "投資入門", "財商教育", "記帳", "存錢筒"]
+FORMAT_POOL = ["Podcast", "IG圖文卡", "Instagram 圖卡", "YouTube 影片", "深度文章", "電子報", "線上講座"]
+
+
+def build_library_csv(n_rows, embedding_dim, seed=0):
+    """產生假 Persona 資料的 CSV 文字"""
+    rng = np.random.default_rng(seed)
+    row_ids = pd.Series(np.arange(n_rows)).astype(str)
+
+    def pick(pool):
+        return pd.Series(np.array(pool, dtype=object)[rng.integers(len(pool), size=n_rows)])
+
+    def pick_terms(pool, k):
+        return pd.Series([",".join(terms) for terms in np.array(pool)[rng.integers(len(pool), size=(n_rows, k))]])
+
+    df = pd.DataFrame({
+        'persona_name': "人物誌 " + row_ids,
+        'summary': pick(SUMMARY_POOL) + " #" + row_ids,
+        'goals': pick(GOALS_POOL) + " #" + row_ids,
+        'pain_points': pick(PAIN_POOL) + " #" + row_ids,
+        'keywords': pick_terms(KEYWORD_POOL, 4),
+        'preferred_formats': pick_terms(FORMAT_POOL, 3),
+    })
+    if embedding_dim:
+        vectors = rng.normal(size=(n_rows, embedding_dim)).astype(np.float32).round(6)
+        df['embeddings'] = ["[" + ", ".join(map(str, row)) + "]" for row in vectors.tolist()]
+    return df.to_csv(index=False)
+
+def load_legacy(csv_text, dtype=None):
+    """原本的讀取方式：一般 read_csv，並把 embedding_text 存成額外欄位"""
+    df = pd.read_csv(io.StringIO(csv_text), dtype=dtype)
+    df['embedding_text'] = df['summary'].fillna('') + ' | ' + \
+                           df['goals'].fillna('') + ' | ' + \
+                           df['pain_points'].fillna('') + ' | ' + \
+                           df['keywords'].fillna('')
+    return df
+
+def measure(name, loader, csv_text):
+    start = time.perf_counter()
+    df = loader(csv_text)
+    elapsed = time.perf_counter() - start
+    usage = df.memory_usage(deep=True, index=False) / 1024 ** 2
+    return name, elapsed, usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persona DataFrame 記憶體用量報告")
+    parser.add_argument("--rows", type=int, default=500_000, help="假 Persona 資料筆數")
+    parser.add_argument("--embedding-dim", type=int, default=0, help="語意向量維度 (0 表示不含語意向量)")
+    args = parser.parse_args()
+
+    print(f"產生 {args.rows:,} 筆假 Persona 資料 (語意向量維度: {args.embedding_dim}) ...")
+    csv_text = build_library_csv(args.rows, args.embedding_dim)
+    print(f"CSV 大小: {len(csv_text.encode('utf-8')) / 1024 ** 2:.1f} MB，pandas {pd.__version__}")
+
+    results = [
+        measure("原始 (object 字串)", lambda text: load_legacy(text, dtype=object), csv_text),
+        measure("原始 (pandas 預設)", load_legacy, csv_text),
+        measure("優化 (load_persona_df)", lambda text: load_persona_df(io.StringIO(text)), csv_text),
+    ]
+
+    columns = PERSONA_COLUMNS + ['embedding_text'] + (['embeddings'] if args.embedding_dim else [])
+    table = pd.DataFrame({name: usage.reindex(columns) for name, _, usage in results})
+    table.loc['總計'] = [usage.sum() for _, _, usage in results]
+    table.loc['讀取時間 (s)'] = [elapsed for _, elapsed, _ in results]
+    print()
+    print("各欄位記憶體用量 (MB)：")
+    print(table.round(1).fillna('-').to_markdown())
+
+
+if __name__ == "__main__":
+    main()
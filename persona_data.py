@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""Persona 資料的讀取與記憶體優化 (Arrow 字串、預先拆分的陣列欄位)，以及內容格式的標準分類"""
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+PERSONA_COLUMNS = ['persona_name', 'summary', 'goals', 'pain_points', 'keywords', 'preferred_formats']
+PERSONA_TERM_COLUMNS = ['keywords', 'preferred_formats']
+TERM_SEPARATOR_PATTERN = r'\s*[,，、]\s*'
+
+STRING_DTYPE = pd.ArrowDtype(pa.string())
+TERMS_DTYPE = pd.ArrowDtype(pa.list_(pa.string()))
+EMBEDDING_DTYPE = pd.ArrowDtype(pa.list_(pa.float32()))
+
+# 常見平台縮寫與格式的同義寫法，正規化後 "IG圖文卡" 與 "Instagram 圖卡" 才會落在同一組
+FORMAT_ALIASES = {'ig': 'instagram', 'fb': 'facebook', 'yt': 'youtube', 'edm': '電子報', '圖卡': '圖文卡'}
+# 不影響格式本身的通用字尾，例如 "Podcast 節目" 與 "Podcast" 視為相同
+FORMAT_GENERIC_WORDS = ['節目', '頻道', '形式']
+# 平台或對比修飾詞不同的格式一律不合併 (例如 YouTube 短影片 / 長影片、線上 / 線下講座)
+FORMAT_PLATFORMS = ['instagram', 'facebook', 'youtube', 'tiktok', 'threads', 'line', 'linkedin', 'podcast', '部落格']
+# 本身就是一種格式的平台，單獨出現時仍可與同平台的寫法合併 (其他平台單獨出現時範圍太廣，不合併)
+FORMAT_STANDALONE_PLATFORMS = ['podcast', '部落格']
+FORMAT_MODIFIERS = ['短', '長', '線上', '線下', '實體', '深度', '直播', '限時', 'reels', '免費', '付費']
+# 含有修飾詞用字、但本身不是修飾詞的常見詞，斷詞時整個詞視為一個單位 (例如 "成長故事" 的「長」不是長度)
+FORMAT_COMPOUND_WORDS = ['成長', '家長', '校長', '長輩', '長者', '專長', '擅長', '延長', '長期', '短期', '長大', '簡短']
+# 斷詞時優先比對的中文詞 (較長的詞優先)，英文以單字為單位，其餘中文逐字切開
+FORMAT_TOKEN_PATTERN = re.compile('|'.join(
+    ['[a-z0-9]+'] +
+    [re.escape(word) for word in sorted(
+        {word for word in FORMAT_PLATFORMS + FORMAT_MODIFIERS + FORMAT_COMPOUND_WORDS if not word.isascii()},
+        key=len, reverse=True,
+    )] +
+    [r'\S']
+))
+# 語意向量只在通過上述規則檢查時才用來額外合併，門檻刻意設高；尚未以實際 Gemini 向量校正
+EMBEDDING_FORMAT_SIMILARITY = 0.9
+
+
+def _is_arrow_list(series):
+    return isinstance(series.dtype, pd.ArrowDtype) and pa.types.is_list(series.dtype.pyarrow_dtype)
+
+def split_terms(series):
+    """將以逗號分隔的關鍵字/格式文字，拆成 Arrow 字串陣列 (只需在載入時做一次)"""
+    if _is_arrow_list(series):
+        return series
+    text = pc.utf8_trim_whitespace(pa.array(series.fillna(''), type=pa.string()))
+    terms = pc.split_pattern_regex(text, TERM_SEPARATOR_PATTERN)
+    terms = pc.if_else(pc.equal(text, ''), pa.scalar([], type=pa.list_(pa.string())), terms)
+    return pd.Series(terms, index=series.index, dtype=TERMS_DTYPE)
+
+def join_terms(series, separator=','):
+    """將陣列欄位組回文字；尚未拆分的文字欄位則直接回傳"""
+    if not _is_arrow_list(series):
+        return series.fillna('').astype(STRING_DTYPE)
+    joined = pc.binary_join(pa.array(series), separator)
+    return pd.Series(joined, index=series.index, dtype=STRING_DTYPE).fillna('')
+
+def parse_embeddings(series):
+    """將語意向量欄位 (CSV 字串或 list) 轉為 Arrow float32 陣列，並正規化為單位向量"""
+    if _is_arrow_list(series) and series.dtype == EMBEDDING_DTYPE:
+        return series
+    if series.empty:
+        return series.astype(EMBEDDING_DTYPE)
+
+    missing = int(series.isna().sum())
+    if missing:
+        raise ValueError(f"語意向量 (embeddings) 欄位有 {missing} 筆缺值，請為所有 Persona 重新建立語意索引")
+
+    if isinstance(series.iloc[0], str):
+        text = pc.utf8_trim(pa.array(series, type=pa.string()), '[] ')
+        parts = pc.split_pattern(text, ',')
+        vectors = pa.ListArray.from_arrays(parts.offsets, pc.utf8_trim_whitespace(parts.flatten()).cast(pa.float32()))
+    else:
+        vectors = pa.array(series.tolist(), type=pa.list_(pa.float32()), from_pandas=True)
+
+    lengths = pc.min_max(pc.list_value_length(vectors)).as_py()
+    if not lengths['min'] or lengths['min'] != lengths['max']:
+        raise ValueError(f"語意向量 (embeddings) 的維度不一致或為空 (最短 {lengths['min']}，最長 {lengths['max']})")
+
+    matrix = vectors.flatten().to_numpy().reshape(len(series), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+    offsets = pa.array(np.arange(0, matrix.size + 1, matrix.shape[1], dtype=np.int32))
+    normalized = pa.ListArray.from_arrays(offsets, pa.array(matrix.ravel()))
+    return pd.Series(normalized, index=series.index, dtype=EMBEDDING_DTYPE)
+
+def embeddings_to_matrix(series):
+    """取得語意向量的 (筆數, 維度) numpy 矩陣，盡量不複製 Arrow 記憶體"""
+    values = pa.array(parse_embeddings(series)).flatten()
+    return values.to_numpy(zero_copy_only=False).reshape(len(series), -1)
+
+def build_embedding_text(df):
+    """組合用於語意分析的文字 (需要時才即時產生，不存回 DataFrame)"""
+    return df['summary'].fillna('') + ' | ' + \
+           df['goals'].fillna('') + ' | ' + \
+           df['pain_points'].fillna('') + ' | ' + \
+           join_terms(df['keywords'])
+
+def load_persona_df(csv_source):
+    """讀取 Persona CSV，文字欄位使用 Arrow 字串，關鍵字與格式預先拆成陣列"""
+    df = pd.read_csv(csv_source, dtype_backend='pyarrow')
+    missing_headers = [h for h in PERSONA_COLUMNS if h not in df.columns]
+    if missing_headers:
+        raise ValueError(f"Persona CSV 檔案缺少欄位: {', '.join(missing_headers)}")
+
+    df = df.drop(columns=['embedding_text'], errors='ignore')
+    # 整欄都沒有語意向量時視同未建立索引，改用關鍵字匹配
+    if 'embeddings' in df.columns and df['embeddings'].isna().all():
+        df = df.drop(columns=['embeddings'])
+    for column in df.columns:
+        if column in PERSONA_TERM_COLUMNS:
+            df[column] = split_terms(df[column])
+        elif column == 'embeddings':
+            df[column] = parse_embeddings(df[column])
+        elif column in PERSONA_COLUMNS:
+            df[column] = df[column].astype(STRING_DTYPE)
+    return df
+
+def personas_to_csv(df):
+    """將 Persona 轉回 CSV 文字 (陣列欄位組回以逗號分隔的文字)"""
+    return df.assign(**{
+        column: join_terms(df[column]) for column in PERSONA_TERM_COLUMNS if column in df.columns
+    }).to_csv(index=False)
+
+def _is_word(token):
+    return token[0].isascii()
+
+def normalize_format_key(term):
+    """格式名稱的比對鍵：小寫、展開縮寫與同義寫法，並去除通用字尾與分隔符號 (英文單字之間保留一個空白)"""
+    text = re.sub(r'[a-z]+', lambda m: FORMAT_ALIASES.get(m.group(0), m.group(0)), str(term).lower())
+    for word, alias in FORMAT_ALIASES.items():
+        if not word.isascii():
+            text = text.replace(word, alias)
+    for word in FORMAT_GENERIC_WORDS:
+        text = text.replace(word, '')
+    key = ''
+    for token in re.findall(r'[a-z0-9]+|[^\sa-z0-9\-_/|·・()（）]+', text):
+        if key and _is_word(token) and _is_word(key[-1]):
+            key += ' '
+        key += token
+    return key
+
+def _format_tokens(key):
+    return tuple(FORMAT_TOKEN_PATTERN.findall(key))
+
+def _format_markers(tokens, words):
+    # 只比對完整的詞，"online" 不含平台 line，"成長" 也不含修飾詞「長」
+    return frozenset(token for token in tokens if token in words)
+
+def _format_signature(tokens):
+    return _format_markers(tokens, FORMAT_PLATFORMS), _format_markers(tokens, FORMAT_MODIFIERS)
+
+def formats_compatible(key_a, key_b):
+    """兩個格式的平台與對比修飾詞是否相同 (不同時一律視為不同格式)"""
+    return _format_signature(_format_tokens(key_a)) == _format_signature(_format_tokens(key_b))
+
+def _format_affixes(tokens):
+    # 所有連續的字首與字尾 (不含完整的 tokens 本身)
+    return {tokens[:i] for i in range(1, len(tokens))} | {tokens[i:] for i in range(1, len(tokens))}
+
+def formats_match(key_a, key_b):
+    """
+    判斷兩個格式比對鍵是否為同一種格式的不同寫法 (平台與對比修飾詞必須相同)：
+    - 中文的中心詞在後，較短者為較長者的連續字尾時合併 (例如 "懶人包" 與 "圖文懶人包")；
+    - 較短者為連續字首時，只有多出一個字 (例如 "圖文" 與 "圖文卡")，
+      或較短者以英文單字結尾 (例如 "podcast" 與 "podcast訪談") 才合併；
+    - 其他情況 (例如 "圖文" 與 "圖文懶人包"、"影音" 與 "影片音樂") 一律不合併。
+    單獨出現的平台名稱 (例如 "instagram") 範圍太廣，不與其他寫法合併。
+    """
+    if key_a == key_b:
+        return True
+    shorter, longer = sorted((_format_tokens(key_a), _format_tokens(key_b)), key=len)
+    if len(''.join(shorter)) < 2 or len(shorter) == len(longer) or not formats_compatible(key_a, key_b):
+        return False
+    if all(token in FORMAT_PLATFORMS and token not in FORMAT_STANDALONE_PLATFORMS for token in shorter):
+        return False
+    if longer[-len(shorter):] == shorter:
+        return True
+    if longer[:len(shorter)] == shorter:
+        remainder = longer[len(shorter):]
+        return _is_word(shorter[-1]) or (len(remainder) == 1 and not _is_word(remainder[0]))
+    return False
+
+def build_format_taxonomy(preferred_formats, embed_fn=None):
+    """
+    將所有 Persona 的偏好格式歸納成標準格式分類，回傳 {格式比對鍵: 標準格式名稱}。
+    分組以 formats_match 的規則為主；提供 embed_fn (接收格式名稱 list、回傳語意向量 list) 時，
+    平台與修飾詞相同且語意相似度夠高的格式也會合併 (只為規則無法合併的分類請求語意向量)。
+    """
+    terms = pa.array(split_terms(preferred_formats)).flatten()
+    counts = pc.value_counts(terms).to_pylist()
+
+    # 先合併比對鍵相同的寫法，並以出現次數最多的寫法作為代表名稱
+    variants = {}
+    for item in sorted(counts, key=lambda item: -item['counts']):
+        label = item['values']
+        key = normalize_format_key(label) if label else ''
+        if not key:
+            continue
+        entry = variants.setdefault(key, {'label': label, 'count': 0})
+        entry['count'] += item['counts']
+    if not variants:
+        return {}
+
+    keys = sorted(variants, key=lambda key: -variants[key]['count'])
+    tokens = [_format_tokens(key) for key in keys]
+
+    # 只有平台與修飾詞相同的格式才可能合併，因此先依此分桶，之後只在同一桶內比對
+    buckets = {}
+    for position in range(len(keys)):
+        buckets.setdefault(_format_signature(tokens[position]), []).append(position)
+
+    # 依出現次數由多到少，將每個寫法併入第一個符合規則的既有分類，否則自成一類。
+    # formats_match 只接受連續的字首/字尾，因此以字首/字尾索引找出候選分類，不必逐一比對
+    parents = list(range(len(keys)))
+    canonical_groups = []
+    for positions in buckets.values():
+        canonical_by_tokens = {}
+        canonical_by_affix = {}
+        canonical_positions = []
+        for position in positions:
+            candidates = [canonical_by_tokens[affix] for affix in _format_affixes(tokens[position])
+                          if affix in canonical_by_tokens]
+            candidates += canonical_by_affix.get(tokens[position], [])
+            matches = [candidate for candidate in candidates if formats_match(keys[candidate], keys[position])]
+            if matches:
+                parents[position] = min(matches)
+                continue
+            canonical_positions.append(position)
+            canonical_by_tokens.setdefault(tokens[position], position)
+            for affix in _format_affixes(tokens[position]):
+                canonical_by_affix.setdefault(affix, []).append(position)
+        if len(canonical_positions) > 1:
+            canonical_groups.append(canonical_positions)
+
+    # 規則分組後，同一桶內還有多個分類時才需要語意向量，再依相似度合併分類
+    if embed_fn is not None and canonical_groups:
+        labels = [variants[keys[position]]['label'] for group in canonical_groups for position in group]
+        vectors = np.asarray(embed_fn(labels), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        start = 0
+        for group in canonical_groups:
+            group_vectors = vectors[start:start + len(group)]
+            start += len(group)
+            kept_vectors = np.empty_like(group_vectors)
+            kept_positions = []
+            for position, vector in zip(group, group_vectors):
+                similar = np.flatnonzero(kept_vectors[:len(kept_positions)] @ vector >= EMBEDDING_FORMAT_SIMILARITY)
+                if len(similar):
+                    parents[position] = kept_positions[similar[0]]
+                else:
+                    kept_vectors[len(kept_positions)] = vector
+                    kept_positions.append(position)
+
+    taxonomy = {}
+    for position, key in enumerate(keys):
+        root = position
+        while parents[root] != root:
+            root = parents[root]
+        taxonomy[key] = variants[keys[root]]['label']
+    return taxonomy
+
+def canonicalize_format(term, taxonomy):
+    """將單一格式名稱對應到標準格式；找不到時改以 formats_match 比對已知格式，再不行則保留原文"""
+    key = normalize_format_key(term)
+    if key in taxonomy:
+        return taxonomy[key]
+    matches = [known_key for known_key in taxonomy if formats_match(known_key, key)]
+    return taxonomy[max(matches, key=len)] if matches else str(term).strip()
+
+def canonical_format_terms(preferred_formats, taxonomy):
+    """將格式欄位的每一列轉為不重複的標準格式名稱 list"""
+    rows = split_terms(preferred_formats).tolist()
+    return pd.Series(
+        [list(dict.fromkeys(canonicalize_format(term, taxonomy) for term in row or [])) for row in rows],
+        index=preferred_formats.index,
+    )
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Persona 混合匹配 (語意 + 關鍵字) 的索引建立與分數融合"""
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from persona_data import embeddings_to_matrix, join_terms
+
+# 混合匹配的分數融合方式 (介面標籤 -> 內部代碼)
+FUSION_METHODS = {
+    "加權總和 (Weighted Sum)": "weighted",
+    "倒數排名融合 (RRF)": "rrf",
+    "僅語意分析": "semantic",
+}
+RRF_K = 60
+
+
+def build_persona_index(df):
+    """預先建立 Persona 的語意向量矩陣與關鍵字索引，匹配時只需做矩陣運算"""
+    # 語意向量在載入時已正規化為單位向量
+    embedding_matrix = embeddings_to_matrix(df['embeddings'])
+
+    # 中文沒有空白斷詞，改用字元 n-gram 建立關鍵字索引
+    searchable_text = df['pain_points'].fillna('') + ' ' + join_terms(df['keywords'])
+    keyword_vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 3), lowercase=True, sublinear_tf=True)
+    keyword_matrix = keyword_vectorizer.fit_transform(searchable_text)
+
+    return {
+        'persona_df': df,
+        'embedding_matrix': embedding_matrix,
+        'keyword_vectorizer': keyword_vectorizer,
+        'keyword_matrix': keyword_matrix,
+    }
+
+def compute_semantic_scores(persona_index, context_embedding):
+    """計算情境向量與所有 Persona 的餘弦相似度"""
+    query_vector = np.asarray(context_embedding, dtype=np.float32)
+    norm = np.linalg.norm(query_vector)
+    if norm > 0:
+        query_vector = query_vector / norm
+    return persona_index['embedding_matrix'] @ query_vector
+
+def compute_keyword_scores(persona_index, context_text):
+    """以預先建立的關鍵字索引，計算情境文字與所有 Persona 的關鍵字相似度"""
+    query_vector = persona_index['keyword_vectorizer'].transform([context_text])
+    return (persona_index['keyword_matrix'] @ query_vector.T).toarray().ravel()
+
+def normalize_scores(scores):
+    """將分數以 min-max 正規化至 0~1"""
+    scores = np.asarray(scores, dtype=np.float64)
+    span = scores.max() - scores.min()
+    if span == 0:
+        return np.ones_like(scores) if scores.max() > 0 else np.zeros_like(scores)
+    return (scores - scores.min()) / span
+
+def fuse_scores(semantic_scores, keyword_scores, method="weighted", semantic_weight=0.7):
+    """融合語意與關鍵字分數 (加權總和或倒數排名融合)，回傳 0~1 之間的分數"""
+    if method == "semantic":
+        return np.asarray(semantic_scores, dtype=np.float64)
+    if method == "rrf":
+        semantic_rank = pd.Series(semantic_scores).rank(method='min', ascending=False).to_numpy()
+        keyword_rank = pd.Series(keyword_scores).rank(method='min', ascending=False).to_numpy()
+        fused = 1 / (RRF_K + semantic_rank) + 1 / (RRF_K + keyword_rank)
+        # 除以兩個訊號皆排名第一時的分數，讓結果落在 0~1
+        return fused / (2 / (RRF_K + 1))
+    return semantic_weight * normalize_scores(semantic_scores) + \
+           (1 - semantic_weight) * normalize_scores(keyword_scores)
@@ -3,10 +3,16 @@ import streamlit as st
 import pandas as pd
 import google.generativeai as genai
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import io
 import re
-import ast
+from persona_data import (
+    build_embedding_text, build_format_taxonomy, canonical_format_terms,
+    join_terms, load_persona_df, parse_embeddings, personas_to_csv,
+)
+from persona_matching import (
+    FUSION_METHODS, build_persona_index, compute_keyword_scores, compute_semantic_scores, fuse_scores,
+)
+from strategy_funnel import FUNNEL_STAGES, build_production_checklist, generate_funnel, parse_strategy_sections
 
 # --- 頁面設定 ---
 st.set_page_config(
@@ -110,12 +116,12 @@ def main():
         return
 
     print("3. 正在準備文字以進行語意分析...")
-    df['embedding_text'] = df['summary'].fillna('') + ' | ' + \\
-                           df['goals'].fillna('') + ' | ' + \\
-                           df['pain_points'].fillna('') + ' | ' + \\
-                           df['keywords'].fillna('')
+    embedding_text = df['summary'].fillna('') + ' | ' + \\
+                     df['goals'].fillna('') + ' | ' + \\
+                     df['pain_points'].fillna('') + ' | ' + \\
+                     df['keywords'].fillna('')
     
-    texts_to_embed = df['embedding_text'].tolist()
+    texts_to_embed = embedding_text.tolist()
 
     print(f"4. 正在為 {{len(texts_to_embed)}} 筆資料請求語意向量 (Embeddings)...")
     print("   (這個步驟可能會需要一些時間，且會消耗您的 API 配額)")
@@ -200,34 +206,75 @@ def process_and_embed_personas(df, api_key):
     """為 Persona DataFrame 生成 Embeddings"""
     try:
         genai.configure(api_key=api_key)
-        df['embedding_text'] = df['summary'].fillna('') + ' | ' + \
-                               df['goals'].fillna('') + ' | ' + \
-                               df['pain_points'].fillna('') + ' | ' + \
-                               df['keywords'].fillna('')
-        
-        texts_to_embed = df['embedding_text'].tolist()
+        texts_to_embed = build_embedding_text(df).tolist()
         
         result = genai.embed_content(
             model='models/text-embedding-004',
             content=texts_to_embed,
             task_type="RETRIEVAL_DOCUMENT"
         )
-        df['embeddings'] = result['embedding']
+        df['embeddings'] = parse_embeddings(pd.Series(result['embedding'], index=df.index))
         return df
     except Exception as e:
         st.error(f"生成 Persona Embeddings 時發生錯誤: {e}")
         return None
 
-def create_dynamic_prompt(topic, selected_personas_df, query_fan_out_df=None):
+def get_persona_index(df):
+    """取得目前 Persona 資料的索引；資料更換時才重新建立"""
+    persona_index = st.session_state.persona_index
+    if persona_index is None or persona_index['persona_df'] is not df:
+        persona_index = build_persona_index(df)
+        st.session_state.persona_index = persona_index
+    return persona_index
+
+# 單次 embed_content 請求可包含的文字數上限
+EMBED_BATCH_SIZE = 100
+
+def embed_format_terms(terms):
+    """為格式名稱取得語意向量，用於將相近的格式寫法歸為同一類"""
+    embeddings = []
+    for start in range(0, len(terms), EMBED_BATCH_SIZE):
+        result = genai.embed_content(
+            model='models/text-embedding-004',
+            content=terms[start:start + EMBED_BATCH_SIZE],
+            task_type="CLUSTERING"
+        )
+        embeddings.extend(result['embedding'])
+    return embeddings
+
+def get_format_taxonomy(df, use_embeddings=None):
+    """取得目前 Persona 資料的標準格式分類；資料更換時才重新建立"""
+    if df is None:
+        return {}
+    # 輸入 API 金鑰後，原本以本地規則建立的分類會改用語意向量重新建立
+    if use_embeddings is None:
+        use_embeddings = st.session_state.api_key_configured
+    cached = st.session_state.format_taxonomy
+    if cached is None or cached['persona_df'] is not df or cached['use_embeddings'] != use_embeddings:
+        taxonomy = {}
+        if 'preferred_formats' in df.columns:
+            try:
+                embed_fn = embed_format_terms if use_embeddings else None
+                taxonomy = build_format_taxonomy(df['preferred_formats'], embed_fn)
+            except Exception as e:
+                st.warning(f"格式語意分組失敗，改用本地比對: {e}")
+                taxonomy = build_format_taxonomy(df['preferred_formats'])
+        cached = {'persona_df': df, 'use_embeddings': use_embeddings, 'taxonomy': taxonomy}
+        st.session_state.format_taxonomy = cached
+    return cached['taxonomy']
+
+def create_dynamic_prompt(topic, selected_personas_df, query_fan_out_df=None, format_taxonomy=None):
     """根據主題和選擇的 Persona 動態生成 Prompt (優化版)"""
     persona_details = ""
+    # 偏好格式以標準格式名稱提供，內容產製清單才能直接在本地彙整
+    preferred_formats = canonical_format_terms(selected_personas_df['preferred_formats'], format_taxonomy or {})
     for index, row in selected_personas_df.iterrows():
         persona_details += f"""
 ### 人物誌 (Persona): {row['persona_name']}
 - **核心摘要:** {row.get('summary', '無')}
 - **主要目標:** {row.get('goals', '無')}
 - **主要痛點:** {row.get('pain_points', '無')}
-- **偏好內容格式:** {row.get('preferred_formats', '無')}
+- **偏好內容格式:** {', '.join(preferred_formats.loc[index]) or '無'}
 """
 
     query_fan_out_section = ""
@@ -246,13 +293,13 @@ def create_dynamic_prompt(topic, selected_personas_df, query_fan_out_df=None):
 * **點子一：**
     * **主題/標題方向:** [一個能直接反映「連結分析」的具體標題]
     * **對應的用戶查詢:** [從 Query Fan Out 中選擇一個最相關的 query/intent]
-    * **建議格式:** [從 Persona 偏好格式中挑選]
+    * **建議格式:** [從 Persona 偏好格式中挑選一個，請完整照抄格式名稱]
     * **理由:** [說明為什麼這個點子和格式能有效**回應對應的用戶查詢**並解決 Persona 的問題]
 
 * **點子二：**
     * **主題/標題方向:** [一個能直接反映「連結分析」的具體標題]
     * **對應的用戶查詢:** [從 Query Fan Out 中選擇一個最相關的 query/intent]
-    * **建議格式:** [從 Persona 偏好格式中挑選]
+    * **建議格式:** [從 Persona 偏好格式中挑選一個，請完整照抄格式名稱]
     * **理由:** [說明為什麼這個點子和格式能有效**回應對應的用戶查詢**並解決 Persona 的問題]
 """
     else:
@@ -260,12 +307,12 @@ def create_dynamic_prompt(topic, selected_personas_df, query_fan_out_df=None):
         idea_structure = """
 * **點子一：**
     * **主題/標題方向:** [一個能直接反映「連結分析」的具體標題]
-    * **建議格式:** [從 Persona 偏好格式中挑選]
+    * **建議格式:** [從 Persona 偏好格式中挑選一個，請完整照抄格式名稱]
     * **理由:** [說明為什麼這個點子和格式能有效解決 Persona 在此主題下的特定問題]
 
 * **點子二：**
     * **主題/標題方向:** [一個能直接反映「連結分析」的具體標題]
-    * **建議格式:** [從 Persona 偏好格式中挑選]
+    * **建議格式:** [從 Persona 偏好格式中挑選一個，請完整照抄格式名稱]
     * **理由:** [說明為什麼這個點子和格式能有效解決 Persona 在此主題下的特定問題]
 """
 
@@ -301,106 +348,7 @@ def create_dynamic_prompt(topic, selected_personas_df, query_fan_out_df=None):
 
 ---
 
-### **總結：內容產製清單 (Content Production Checklist)**
-
-現在，請扮演一位**內容製作總監**。請回顧以上**所有**為不同 Persona 生成的內容點子，並將它們整合成一個清晰的總表。
-
-這個表格的目的是讓團隊一目了然地知道總共需要製作哪些類型的內容，以及每個類型有哪些具體的點子。
-
-請遵循以下表格格式，將**相似的「建議格式」**的點子歸類在一起：
-
-| 內容格式 (Media Format) | 主題/標題方向 (Topic/Title Ideas) |
-| :--- | :--- |
-| **[例如：YouTube 深度影片]** | - [標題方向A]<br>- [標題方向B]<br>- [標題方向C] |
-| **[例如：Podcast]** | - [標題方向D]<br>- [標題方向E] |
-| **[例如：IG 圖文卡]** | - [標題方向F] |
-
-請確保表格完整涵蓋了前面提到的所有點子。
-"""
-
-
-def create_funnel_prompt(topic, strategy_text, conversion_goal, query_fan_out_df=None):
-    """根據初步策略和轉換目標生成行銷漏斗策略的 Prompt"""
-    query_fan_out_section = ""
-    if query_fan_out_df is not None and not query_fan_out_df.empty:
-        query_fan_out_section = f"""
-在規劃時，請優先考慮以下「Query Fan Out」資料中，具有高商業意圖或能解決深度問題的查詢，將其融入你的漏斗策略中：
-```
-{query_fan_out_df.to_markdown(index=False)}
-```
-"""
-
-    conversion_goal_section = f"""
-**重要：最終轉換目標**
-請將以下的具體產品/服務資訊作為你設計「轉換階段 (BOFU)」內容與 CTA 的最終目標：
-- **產品/服務名稱:** {conversion_goal.get('name', '未提供')}
-- **期望用戶完成的動作:** {conversion_goal.get('action', '未提供')}
-- **最終導向的目標網址:** {conversion_goal.get('url', '未提供')}
-- **產品/服務簡介:** {conversion_goal.get('desc', '未提供')}
-
-請確保漏斗的最後一步能有效地將用戶引導至此目標。
-"""
-
-    return f"""
-請扮演一位頂尖的數位行銷策略總監 (Head of Digital Strategy)，專精於設計高轉換率的內容行銷漏斗。
-我的核心主題是：「{topic}」。
-{query_fan_out_section}
-{conversion_goal_section}
-
-這是一份由 AI 內容策略顧問針對不同 Persona 生成的初步內容點子清單：
-```markdown
-{strategy_text}
-```
-
-你的任務是，將這些零散的點子，整合成一個**環環相扣、無縫引導**的完整行銷活動。
-
-請嚴格遵循以下步驟與格式輸出：
-
----
-
-### **整合行銷漏斗策略："{topic}"**
-
-**📈 總體策略與用戶旅程 (Overall Strategy & User Journey):**
-(請在此以故事線的方式，清晰描述一個典型用戶從接觸第一個內容(認知)，到最後完成購買(轉換)的完整路徑。明確指出每一個階段的轉換目標和引導機制。)
-
----
-
-### **1. 認知階段 (Awareness - Top of Funnel)**
-*目標：透過高價值、易擴散的內容，大規模吸引對此主題感興趣的潛在用戶，建立品牌專業形象。*
-
-**➡️ 內容點子 1 (主打):** [從清單中選擇最適合引流的內容點子]
-   - **目標 Persona:** [此點子主要針對的 Persona]
-   - **引流與擴散策略:** [例如：針對此主題投放 Instagram/Facebook 廣告；優化 SEO 關鍵字「...」；與親子KOL合作推廣此內容]
-   - **➡️ 轉換至下一階段的 CTA (Call-to-Action):** **(此為重點)** [設計一個明確的行動呼籲，將用戶從這個認知內容，引導至考慮階段的內容。例如：「想知道如何實際應用嗎？點擊連結，免費下載我們的『XXX實踐手冊』！」]
-
----
-
-### **2. 考慮階段 (Consideration - Middle of Funnel)**
-*目標：透過更深入、更具體的內容，解決用戶的核心痛點，建立信任感，並獲取潛在客戶名單 (Leads)。*
-
-**➡️ 內容點子 2 (主打):** [從清單中選擇最適合建立信任/獲取名單的內容點子，例如電子書、網路研討會、深度指南]
-   - **目標 Persona:** [此點子主要針對的 Persona]
-   - **接收流量來源:** [明確說明此內容的流量主要來自哪個認知階段的內容]
-   - **價值交換設計 (Lead Magnet):** [例如：設計成一份精美的 PDF 電子書，用戶需提供 Email 才能下載。]
-   - **➡️ 轉換至下一階段的 CTA (Call-to-Action):** **(此為重點)** [在用戶獲取此內容後，設計後續的引導路徑。例如：「下載手冊後，我們將在三天後寄送一封郵件，與您分享如何將手冊內容應用在...，並提供一個專屬的訂閱優惠。」]
-
----
-
-### **3. 轉換階段 (Conversion - Bottom of Funnel)**
-*目標：臨門一腳，透過直接的價值主張與誘因，促使用戶完成最終購買決策。*
-
-**➡️ 內容點子 3 (主打):** [從清單中選擇最適合導購的內容點子，例如產品比較、用戶見證、優惠活動頁]
-   - **目標 Persona:** [此點子主要針對的 Persona]
-   - **接收流量來源:** [明確說明此內容的流量主要來自哪個考慮階段的內容或後續的 Email/LINE 行銷]
-   - **導購與行動呼籲 (CTA) 設計:** [設計強而有力的 CTA，**務必結合前面提供的產品資訊與目標網址**。例如：「立即訂閱『{conversion_goal.get('name', '我們的服務')}』，解鎖所有專家內容！點擊前往：{conversion_goal.get('url', '#')}」]
-
----
-
-**📊 總結：用戶旅程地圖**
-(請用流程圖的方式，總結從 TOFU 到 BOFU 的轉換路徑)
-* **[認知內容]** (例如: IG Reels 短影音) → **CTA:** "留言+1索取完整指南"
-* → **[考慮內容]** (例如: 私訊發送 PDF 指南) → **CTA:** "指南中附有專屬訂閱優惠連結"
-* → **[轉換內容]** (例如: 優惠訂閱頁面) → **最終目標:** 完成訂閱
+請只輸出每個人物誌的策略建議，不需要額外的總結或彙整表格。
 """
 
 
@@ -415,6 +363,12 @@ if 'api_key_configured' not in st.session_state:
     st.session_state.api_key_configured = False
 if 'strategy_text' not in st.session_state:
     st.session_state.strategy_text = None
+if 'persona_index' not in st.session_state:
+    st.session_state.persona_index = None
+if 'format_taxonomy' not in st.session_state:
+    st.session_state.format_taxonomy = None
+if 'funnel_stage_cache' not in st.session_state:
+    st.session_state.funnel_stage_cache = {}
 
 # --- Streamlit 介面佈局 ---
 
@@ -476,7 +430,9 @@ with st.sidebar:
                                 csv_text = pasted_persona_csv
 
                         csv_io = io.StringIO(csv_text)
-                        df = pd.read_csv(csv_io)
+                        df = load_persona_df(csv_io)
+                        # 載入時只以本地規則建立格式分類，語意向量的分組留到生成策略時才進行
+                        get_format_taxonomy(df, use_embeddings=False)
                         st.session_state.persona_df = df
                         st.success(f"成功處理 {len(df)} 筆貼上的 Persona 資料！")
                     except Exception as e:
@@ -490,31 +446,31 @@ with st.sidebar:
         type="csv",
         key="persona_uploader",
     )
-    if uploaded_persona_file:
+    # 同一個檔案只在第一次上傳時讀取，避免每次重新執行都重複解析；讀取結果的訊息則每次都顯示
+    if uploaded_persona_file is None:
+        st.session_state.persona_file_id = None
+    elif uploaded_persona_file.file_id != st.session_state.get('persona_file_id'):
+        st.session_state.persona_file_id = uploaded_persona_file.file_id
+        persona_file_messages = []
         try:
-            # 將上傳的檔案轉換為 DataFrame
-            df = pd.read_csv(uploaded_persona_file)
-            
-            # 檢查必要的欄位是否存在
-            required_headers = ['persona_name', 'summary', 'goals', 'pain_points', 'keywords', 'preferred_formats']
-            
-            if 'embeddings' in df.columns:
-                required_headers.append('embeddings')
-
-            missing_headers = [h for h in required_headers if h not in df.columns]
+            # 將上傳的檔案轉換為 DataFrame (同時檢查必要的欄位是否存在)
+            df = load_persona_df(uploaded_persona_file)
 
             if 'embeddings' not in df.columns:
-                 st.warning("提醒：您上傳的檔案不含語意向量 (Embeddings)。")
+                persona_file_messages.append(('warning', "提醒：您上傳的檔案不含語意向量 (Embeddings)。"))
 
-            if missing_headers and 'embeddings' not in missing_headers:
-                st.error(f"Persona CSV 檔案缺少欄位: {', '.join(missing_headers)}")
-                st.session_state.persona_df = None
-            else:
-                st.session_state.persona_df = df
-                st.success(f"成功載入 {len(df)} 筆 Persona 資料！")
+            # 載入時只以本地規則建立格式分類，語意向量的分組留到生成策略時才進行
+            get_format_taxonomy(df, use_embeddings=False)
+            st.session_state.persona_df = df
+            persona_file_messages.append(('success', f"成功載入 {len(df)} 筆 Persona 資料！"))
         except Exception as e:
-            st.error(f"Persona 檔案讀取失敗：{e}")
+            persona_file_messages.append(('error', f"Persona 檔案讀取失敗：{e}"))
             st.session_state.persona_df = None
+        st.session_state.persona_file_messages = persona_file_messages
+
+    if uploaded_persona_file is not None:
+        for level, message in st.session_state.get('persona_file_messages', []):
+            getattr(st, level)(message)
     
     # 區塊 C: 建立語意索引 (選填)
     if st.session_state.persona_df is not None and 'embeddings' not in st.session_state.persona_df.columns:
@@ -534,7 +490,7 @@ with st.sidebar:
         with st.expander("或產生本地端執行腳本 (推薦)"):
             st.markdown("若資料量龐大，建議產生 Python 腳本在您自己的電腦上執行，以避免 API 超額問題。")
             if st.button("產生本地端執行腳本", key="gen_embedding_script"):
-                df_string = st.session_state.persona_df.to_csv(index=False)
+                df_string = personas_to_csv(st.session_state.persona_df)
                 st.session_state.embedding_script = create_embedding_script(df_string, api_key)
             
             if 'embedding_script' in st.session_state:
@@ -580,6 +536,14 @@ with st.sidebar:
 
     st.markdown("---")
 
+    fusion_label = list(FUSION_METHODS)[0]
+    semantic_weight = 0.7
+    if st.session_state.persona_df is not None and 'embeddings' in st.session_state.persona_df.columns:
+        with st.expander("進階匹配設定"):
+            fusion_label = st.radio("語意與關鍵字分數融合方式", list(FUSION_METHODS), key="fusion_method")
+            if FUSION_METHODS[fusion_label] == "weighted":
+                semantic_weight = st.slider("語意分數權重", min_value=0.0, max_value=1.0, value=0.7, step=0.05, key="semantic_weight")
+
     if st.button("🔍 執行策略分析", use_container_width=True, type="primary"):
         if not st.session_state.api_key_configured:
             st.warning("請先輸入並驗證您的 API 金鑰。")
@@ -591,31 +555,35 @@ with st.sidebar:
             # 執行匹配
             with st.spinner("正在進行分析與匹配..."):
                 try:
-                    df = st.session_state.persona_df.copy()
-                    
+                    df = st.session_state.persona_df
+                    fusion_method = FUSION_METHODS[fusion_label]
+
                     # 判斷使用何種匹配模式
                     if 'embeddings' in df.columns and not df['embeddings'].isnull().all():
-                        st.info("偵測到語意索引，將使用語意分析模式。")
-                        # 智慧判斷是否需要轉換
-                        if isinstance(df['embeddings'].iloc[0], str):
-                            df['embeddings'] = df['embeddings'].apply(ast.literal_eval)
+                        if fusion_method == "semantic":
+                            st.info("偵測到語意索引，將使用語意分析模式。")
+                        else:
+                            st.info("偵測到語意索引，將使用混合 (語意 + 關鍵字) 分析模式。")
+                        persona_index = get_persona_index(df)
 
                         context_text = topic
+                        keyword_context_text = topic
                         if st.session_state.query_fan_out_df is not None:
                             queries = " ".join(st.session_state.query_fan_out_df['query'].fillna(''))
                             intents = " ".join(st.session_state.query_fan_out_df['user_intent'].fillna(''))
                             context_text = f"{topic} - 相關查詢與意圖: {queries} {intents}"
+                            keyword_context_text += " " + queries
 
                         context_embedding_result = genai.embed_content(
                             model='models/text-embedding-004',
                             content=context_text,
                             task_type="RETRIEVAL_QUERY"
                         )
-                        context_embedding = np.array(context_embedding_result['embedding']).reshape(1, -1)
-                        
-                        persona_embeddings = np.array(df['embeddings'].tolist())
-                        similarities = cosine_similarity(context_embedding, persona_embeddings)[0]
-                        df['score'] = similarities
+                        semantic_scores = compute_semantic_scores(persona_index, context_embedding_result['embedding'])
+                        keyword_scores = None
+                        if fusion_method != "semantic":
+                            keyword_scores = compute_keyword_scores(persona_index, keyword_context_text)
+                        scores = fuse_scores(semantic_scores, keyword_scores, fusion_method, semantic_weight)
                     else:
                         st.info("未偵測到語意索引，將使用關鍵字匹配模式。")
                         context_text = topic
@@ -624,18 +592,15 @@ with st.sidebar:
                             context_text += " " + queries
                         
                         topic_tokens = set(context_text.lower().split())
+                        searchable_text = (df['pain_points'].fillna('') + ' ' + join_terms(df['keywords'])).str.lower()
 
-                        def calculate_keyword_score(row):
-                            score = 0
-                            searchable_text = f"{row.get('pain_points', '')} {row.get('keywords', '')}".lower()
-                            for token in topic_tokens:
-                                if token in searchable_text:
-                                    score += 1
-                            return score
-                        
-                        df['score'] = df.apply(calculate_keyword_score, axis=1)
+                        scores = np.zeros(len(df), dtype=int)
+                        for token in topic_tokens:
+                            scores += searchable_text.str.contains(token, regex=False).to_numpy(dtype=int)
 
-                    matched = df.sort_values(by='score', ascending=False).head(10)
+                    # 只取出前 10 名，避免複製整份 Persona 資料
+                    top_positions = np.argsort(-scores, kind='stable')[:10]
+                    matched = df.iloc[top_positions].assign(score=scores[top_positions])
                     st.session_state.matched_personas = matched
                     st.session_state.strategy_text = None 
                 except Exception as e:
@@ -673,11 +638,13 @@ if st.session_state.matched_personas is not None:
                 try:
                     model = genai.GenerativeModel('gemini-1.5-flash-latest')
                     selected_df = st.session_state.matched_personas.loc[selected_indices]
-                    prompt = create_dynamic_prompt(topic, selected_df, st.session_state.query_fan_out_df)
 
                     with st.spinner("🧠 AI 內容顧問正在生成初步點子..."):
+                        format_taxonomy = get_format_taxonomy(st.session_state.persona_df)
+                        prompt = create_dynamic_prompt(topic, selected_df, st.session_state.query_fan_out_df, format_taxonomy)
                         response = model.generate_content(prompt)
                         st.session_state.strategy_text = response.text
+                        st.session_state.funnel_stage_cache = {}
 
                 except Exception as e:
                     st.error(f"生成初步策略時發生錯誤：{e}")
@@ -688,6 +655,13 @@ if st.session_state.matched_personas is not None:
         st.subheader("5. AI 生成的初步內容策略")
         st.markdown(st.session_state.strategy_text)
 
+        production_checklist = build_production_checklist(
+            st.session_state.strategy_text, get_format_taxonomy(st.session_state.persona_df)
+        )
+        if production_checklist:
+            st.markdown("### **總結：內容產製清單 (Content Production Checklist)**")
+            st.markdown(production_checklist)
+
         st.markdown("---")
         st.subheader("6. 整合行銷漏斗策略")
         
@@ -716,11 +690,19 @@ if st.session_state.matched_personas is not None:
                     }
                     try:
                         model = genai.GenerativeModel('gemini-1.5-flash-latest')
-                        funnel_prompt = create_funnel_prompt(topic, st.session_state.strategy_text, conversion_goal, st.session_state.query_fan_out_df)
-                        
+                        strategy_sections = parse_strategy_sections(st.session_state.strategy_text)
+
+                        # 依序生成各階段；只有內容有變動的階段會重新呼叫 AI
                         with st.spinner("👑 AI 行銷總監正在建構漏斗策略..."):
-                            funnel_response = model.generate_content(funnel_prompt)
-                            st.markdown(funnel_response.text)
+                            stage_outputs, reused_stages = generate_funnel(
+                                model, topic, strategy_sections, conversion_goal,
+                                st.session_state.query_fan_out_df, st.session_state.funnel_stage_cache
+                            )
+
+                        st.markdown(f'### **整合行銷漏斗策略："{topic}"**')
+                        st.markdown("\n\n---\n\n".join(stage_outputs))
+                        if reused_stages:
+                            st.caption(f"已沿用 {reused_stages} 個未變動階段的先前結果，僅重新生成 {len(FUNNEL_STAGES) - reused_stages} 個階段。")
 
                     except Exception as e:
                         st.error(f"生成行銷漏斗時發生錯誤：{e}")
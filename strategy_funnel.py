@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""初步策略的段落解析、內容產製清單，以及整合行銷漏斗的分階段 Prompt 與快取"""
+import hashlib
+import re
+
+import pandas as pd
+
+from persona_data import canonical_format_terms
+
+STRATEGY_SECTION_PATTERN = re.compile(r'^#{2,4}\s*\**針對「(.+?)」的內容策略\**', re.MULTILINE)
+STRATEGY_SUMMARY_PATTERN = re.compile(r'^#{2,4}\s*\**總結', re.MULTILINE)
+FUNNEL_STAGES = ['tofu', 'mofu', 'bofu', 'journey']
+
+def parse_strategy_sections(strategy_text):
+    """
+    將初步策略拆成以 Persona 為單位的段落 (不含最後的總結清單)，回傳依原順序排列的 (Persona 名稱, 段落) list。
+    不同 Persona 可能同名，因此不以名稱作為 key，避免後面的段落覆蓋前面的段落。
+    """
+    matches = list(STRATEGY_SECTION_PATTERN.finditer(strategy_text))
+    if not matches:
+        # AI 未依格式輸出時，退回以整份策略作為單一段落
+        return [('全部 Persona', strategy_text.strip())]
+
+    sections = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(strategy_text)
+        section = STRATEGY_SUMMARY_PATTERN.split(strategy_text[match.start():end])[0]
+        sections.append((match.group(1).strip(), section.strip().strip('-').strip()))
+    return sections
+
+IDEA_FIELD_PATTERN = re.compile(r'\*\*(主題/標題方向|建議格式)\s*[:：]?\s*\*\*\s*[:：]?\s*(.+)')
+
+def parse_strategy_ideas(strategy_text):
+    """從初步策略中擷取每個內容點子的 Persona、標題方向與建議格式"""
+    ideas = []
+    for persona_name, section in parse_strategy_sections(strategy_text):
+        title = None
+        for field, value in IDEA_FIELD_PATTERN.findall(section):
+            if field == '主題/標題方向':
+                title = value.strip()
+            elif title:
+                ideas.append({'persona_name': persona_name, 'title': title, 'format': value.strip()})
+                title = None
+    return pd.DataFrame(ideas, columns=['persona_name', 'title', 'format'])
+
+def build_production_checklist(strategy_text, format_taxonomy):
+    """依標準格式分類，在本地彙整所有內容點子成內容產製清單 (Markdown 表格)"""
+    ideas = parse_strategy_ideas(strategy_text)
+    if ideas.empty:
+        return None
+
+    ideas['format'] = canonical_format_terms(ideas['format'], format_taxonomy)
+    ideas = ideas.explode('format').dropna(subset=['format'])
+    rows = [
+        "| 內容格式 (Media Format) | 主題/標題方向 (Topic/Title Ideas) |",
+        "| :--- | :--- |",
+    ]
+    for media_format, titles in ideas.groupby('format', sort=False)['title']:
+        title_list = "<br>".join(f"- {title}".replace('|', '\\|') for title in dict.fromkeys(titles))
+        rows.append(f"| **{media_format}** | {title_list} |")
+    return "\n".join(rows)
+
+def create_funnel_stage_prompt(stage, topic, strategy_sections, previous_stages, conversion_goal=None, query_fan_out_df=None):
+    """為行銷漏斗的單一階段 (TOFU/MOFU/BOFU/用戶旅程) 生成 Prompt"""
+    query_fan_out_section = ""
+    if stage != 'journey' and query_fan_out_df is not None and not query_fan_out_df.empty:
+        query_fan_out_section = f"""
+在規劃時，請優先考慮以下「Query Fan Out」資料中，具有高商業意圖或能解決深度問題的查詢，將其融入你的漏斗策略中：
+```
+{query_fan_out_df.to_markdown(index=False)}
+```
+"""
+
+    conversion_goal_section = ""
+    if stage in ('bofu', 'journey'):
+        conversion_goal_section = f"""
+**重要：最終轉換目標**
+請將以下的具體產品/服務資訊作為你設計「轉換階段 (BOFU)」內容與 CTA 的最終目標：
+- **產品/服務名稱:** {conversion_goal.get('name', '未提供')}
+- **期望用戶完成的動作:** {conversion_goal.get('action', '未提供')}
+- **最終導向的目標網址:** {conversion_goal.get('url', '未提供')}
+- **產品/服務簡介:** {conversion_goal.get('desc', '未提供')}
+
+請確保漏斗的最後一步能有效地將用戶引導至此目標。
+"""
+
+    strategy_section = ""
+    if stage != 'journey':
+        strategy_markdown = "\n\n".join(section for _, section in strategy_sections)
+        strategy_section = f"""
+這是一份由 AI 內容策略顧問針對不同 Persona 生成的初步內容點子清單：
+```markdown
+{strategy_markdown}
+```
+"""
+
+    previous_section = ""
+    if previous_stages:
+        previous_markdown = "\n\n---\n\n".join(previous_stages)
+        previous_section = f"""
+以下是此漏斗中已經規劃完成的前面階段，請與其內容及 CTA 環環相扣：
+```markdown
+{previous_markdown}
+```
+"""
+
+    if stage == 'tofu':
+        task = """你的任務是，從這些點子中規劃整合行銷漏斗的**第一個階段**，為後續階段鋪路。
+
+請**只**輸出以下段落，不要有任何其他的開頭或結尾文字：
+
+### **1. 認知階段 (Awareness - Top of Funnel)**
+*目標：透過高價值、易擴散的內容，大規模吸引對此主題感興趣的潛在用戶，建立品牌專業形象。*
+
+**➡️ 內容點子 1 (主打):** [從清單中選擇最適合引流的內容點子]
+   - **目標 Persona:** [此點子主要針對的 Persona]
+   - **引流與擴散策略:** [例如：針對此主題投放 Instagram/Facebook 廣告；優化 SEO 關鍵字「...」；與親子KOL合作推廣此內容]
+   - **➡️ 轉換至下一階段的 CTA (Call-to-Action):** **(此為重點)** [設計一個明確的行動呼籲，將用戶從這個認知內容，引導至考慮階段的內容。例如：「想知道如何實際應用嗎？點擊連結，免費下載我們的『XXX實踐手冊』！」]
+"""
+    elif stage == 'mofu':
+        task = """你的任務是，接續已規劃的認知階段，規劃整合行銷漏斗的**考慮階段**。
+
+請**只**輸出以下段落，不要有任何其他的開頭或結尾文字：
+
+### **2. 考慮階段 (Consideration - Middle of Funnel)**
+*目標：透過更深入、更具體的內容，解決用戶的核心痛點，建立信任感，並獲取潛在客戶名單 (Leads)。*
+
+**➡️ 內容點子 2 (主打):** [從清單中選擇最適合建立信任/獲取名單的內容點子，例如電子書、網路研討會、深度指南]
+   - **目標 Persona:** [此點子主要針對的 Persona]
+   - **接收流量來源:** [明確說明此內容的流量主要來自哪個認知階段的內容]
+   - **價值交換設計 (Lead Magnet):** [例如：設計成一份精美的 PDF 電子書，用戶需提供 Email 才能下載。]
+   - **➡️ 轉換至下一階段的 CTA (Call-to-Action):** **(此為重點)** [在用戶獲取此內容後，設計後續的引導路徑。例如：「下載手冊後，我們將在三天後寄送一封郵件，與您分享如何將手冊內容應用在...，並提供一個專屬的訂閱優惠。」]
+"""
+    elif stage == 'bofu':
+        task = f"""你的任務是，接續已規劃的考慮階段，規劃整合行銷漏斗的**轉換階段**。
+
+請**只**輸出以下段落，不要有任何其他的開頭或結尾文字：
+
+### **3. 轉換階段 (Conversion - Bottom of Funnel)**
+*目標：臨門一腳，透過直接的價值主張與誘因，促使用戶完成最終購買決策。*
+
+**➡️ 內容點子 3 (主打):** [從清單中選擇最適合導購的內容點子，例如產品比較、用戶見證、優惠活動頁]
+   - **目標 Persona:** [此點子主要針對的 Persona]
+   - **接收流量來源:** [明確說明此內容的流量主要來自哪個考慮階段的內容或後續的 Email/LINE 行銷]
+   - **導購與行動呼籲 (CTA) 設計:** [設計強而有力的 CTA，**務必結合前面提供的產品資訊與目標網址**。例如：「立即訂閱『{conversion_goal.get('name', '我們的服務')}』，解鎖所有專家內容！點擊前往：{conversion_goal.get('url', '#')}」]
+"""
+    else:
+        task = """你的任務是，根據以上已規劃完成的三個階段，總結這個整合行銷活動的完整用戶旅程。
+
+請**只**輸出以下段落，不要有任何其他的開頭或結尾文字：
+
+**📈 總體策略與用戶旅程 (Overall Strategy & User Journey):**
+(請在此以故事線的方式，清晰描述一個典型用戶從接觸第一個內容(認知)，到最後完成購買(轉換)的完整路徑。明確指出每一個階段的轉換目標和引導機制。)
+
+**📊 總結：用戶旅程地圖**
+(請用流程圖的方式，總結從 TOFU 到 BOFU 的轉換路徑)
+* **[認知內容]** (例如: IG Reels 短影音) → **CTA:** "留言+1索取完整指南"
+* → **[考慮內容]** (例如: 私訊發送 PDF 指南) → **CTA:** "指南中附有專屬訂閱優惠連結"
+* → **[轉換內容]** (例如: 優惠訂閱頁面) → **最終目標:** 完成訂閱
+"""
+
+    return f"""
+請扮演一位頂尖的數位行銷策略總監 (Head of Digital Strategy)，專精於設計高轉換率的內容行銷漏斗。
+我的核心主題是：「{topic}」。
+{query_fan_out_section}
+{conversion_goal_section}
+{strategy_section}
+{previous_section}
+{task}
+"""
+
+def generate_funnel_stage(model, prompt, cache):
+    """生成單一漏斗階段；相同的 Prompt 直接沿用快取結果。回傳 (內容, 是否來自快取)"""
+    cache_key = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+    if cache_key in cache:
+        return cache[cache_key], True
+    response = model.generate_content(prompt)
+    cache[cache_key] = response.text
+    return response.text, False
+
+def generate_funnel(model, topic, strategy_sections, conversion_goal, query_fan_out_df, cache):
+    """依序生成漏斗各階段，只有內容有變動的階段會重新呼叫 AI。回傳 (各階段內容 list, 沿用快取的階段數)"""
+    stage_outputs = []
+    reused_stages = 0
+    for stage in FUNNEL_STAGES:
+        stage_prompt = create_funnel_stage_prompt(
+            stage, topic, strategy_sections,
+            stage_outputs if stage == 'journey' else stage_outputs[-1:],
+            conversion_goal, query_fan_out_df
+        )
+        stage_text, from_cache = generate_funnel_stage(model, stage_prompt, cache)
+        stage_outputs.append(stage_text.strip())
+        reused_stages += from_cache
+    return stage_outputs, reused_stages
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+import io
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from persona_data import (
+    build_format_taxonomy, canonicalize_format, formats_compatible, load_persona_df, normalize_format_key,
+)
+
+HEADER = '"persona_name","summary","goals","pain_points","keywords","preferred_formats","embeddings"\n'
+
+
+def load(rows):
+    return load_persona_df(io.StringIO(HEADER + rows))
+
+
+def test_embeddings_are_parsed_and_normalized():
+    df = load('"a","s","g","p","k1,k2","f","[3, 4]"\n')
+    assert df['embeddings'].tolist() == [pytest.approx([0.6, 0.8])]
+    assert df['keywords'].tolist() == [['k1', 'k2']]
+
+
+def test_empty_embeddings_column_falls_back_to_keyword_mode():
+    df = load('"a","s","g","p","k","f",\n"b","s","g","p","k","f",\n')
+    assert 'embeddings' not in df.columns
+
+
+def test_partially_missing_embeddings_raise():
+    with pytest.raises(ValueError, match="缺值"):
+        load('"a","s","g","p","k","f","[1, 2]"\n"b","s","g","p","k","f",\n')
+
+
+def test_uneven_embedding_dimensions_raise():
+    with pytest.raises(ValueError, match="維度"):
+        load('"a","s","g","p","k","f","[1, 2]"\n"b","s","g","p","k","f","[1]"\n')
+
+
+def test_missing_required_columns_raise():
+    with pytest.raises(ValueError, match="pain_points"):
+        load_persona_df(io.StringIO('"persona_name","summary","goals"\n"a","b","c"\n'))
+
+
+# --- 格式標準分類 ---
+
+SAME_FORMAT_PAIRS = [
+    ("IG圖文卡", "Instagram 圖卡"),
+    ("IG圖文卡", "IG 圖文"),
+    ("YouTube 影片", "YT影片"),
+    ("Podcast", "podcast 節目"),
+    ("電子報", "Email 電子報"),
+    ("懶人包", "圖文懶人包"),
+    ("Facebook 貼文", "FB貼文"),
+    ("Podcast", "Podcast 訪談"),
+    ("文章", "成長故事文章"),
+    ("短影片", "家長短影片"),
+    ("線上課程", "Online 線上課程"),
+]
+
+DIFFERENT_FORMAT_PAIRS = [
+    ("線上講座", "線下講座"),
+    ("YouTube 長影片", "YouTube 短影片"),
+    ("YouTube 影片", "YouTube 短影片"),
+    ("深度文章", "短文章"),
+    ("文章", "深度文章"),
+    ("線上講座", "線上課程"),
+    ("IG圖文卡", "IG Reels"),
+    ("IG圖文卡", "Instagram 限時動態"),
+    ("IG圖文卡", "Instagram"),
+    ("影片", "YouTube 影片"),
+    ("Facebook 社團", "FB貼文"),
+    ("圖文", "圖文懶人包"),
+    ("影音", "影片音樂"),
+    ("文章", "成長故事短文章"),
+    ("YouTube", "YouTube 影片"),
+]
+
+
+def test_markers_match_whole_tokens_only():
+    # "online" 不含平台 line，"成長" 與 "家長" 也不含修飾詞「長」
+    assert formats_compatible(normalize_format_key("Online 課程"), normalize_format_key("課程"))
+    assert formats_compatible(normalize_format_key("成長故事文章"), normalize_format_key("文章"))
+    assert formats_compatible(normalize_format_key("家長講座"), normalize_format_key("講座"))
+    assert not formats_compatible(normalize_format_key("LINE 官方帳號"), normalize_format_key("官方帳號"))
+
+
+def taxonomy_for(*formats, embed_fn=None):
+    return build_format_taxonomy(pd.Series([",".join(formats)]), embed_fn)
+
+
+@pytest.mark.parametrize("canonical, variant", SAME_FORMAT_PAIRS)
+def test_format_variants_are_merged(canonical, variant):
+    taxonomy = taxonomy_for(canonical, canonical, variant)
+    assert canonicalize_format(variant, taxonomy) == canonical
+
+
+@pytest.mark.parametrize("format_a, format_b", DIFFERENT_FORMAT_PAIRS)
+def test_different_formats_are_kept_apart(format_a, format_b):
+    taxonomy = taxonomy_for(format_a, format_a, format_b)
+    assert canonicalize_format(format_b, taxonomy) == format_b
+
+
+INCOMPATIBLE_FORMAT_PAIRS = [
+    ("線上講座", "線下講座"),
+    ("YouTube 長影片", "YouTube 短影片"),
+    ("YouTube 影片", "YouTube 短影片"),
+    ("深度文章", "短文章"),
+    ("IG圖文卡", "IG Reels"),
+    ("影片", "YouTube 影片"),
+]
+
+
+@pytest.mark.parametrize("format_a, format_b", INCOMPATIBLE_FORMAT_PAIRS)
+def test_embedding_similarity_cannot_merge_incompatible_formats(format_a, format_b):
+    # 即使語意向量完全相同，平台或對比修飾詞不同的格式也不能合併
+    taxonomy = taxonomy_for(format_a, format_a, format_b, embed_fn=lambda terms: [[1.0, 0.0]] * len(terms))
+    assert canonicalize_format(format_b, taxonomy) == format_b
+
+
+def test_embedding_similarity_merges_compatible_formats():
+    taxonomy = taxonomy_for("線上講座", "線上講座", "線上研討會", embed_fn=lambda terms: [[1.0, 0.0]] * len(terms))
+    assert canonicalize_format("線上研討會", taxonomy) == "線上講座"
+
+
+def test_embeddings_are_only_requested_for_formats_rules_cannot_settle():
+    requested = []
+
+    def embed_fn(terms):
+        requested.extend(terms)
+        return [[1.0, 0.0]] * len(terms)
+
+    # "IG Reels" 自成一桶、"圖文懶人包" 已由規則併入 "懶人包"，都不需要語意向量
+    taxonomy_for("懶人包", "懶人包", "圖文懶人包", "IG Reels", "線上講座", "線上講座", "線上研討會", embed_fn=embed_fn)
+    assert sorted(requested) == ["線上研討會", "線上講座"]
+
+
+def synthetic_free_text_formats(n, seed=0):
+    rng = np.random.default_rng(seed)
+    nouns = ["影片", "文章", "懶人包", "講座", "電子報", "貼文", "圖文卡", "課程", "Podcast", "直播"]
+    prefixes = ["", "", "IG ", "YouTube ", "FB ", "線上", "短", "深度"]
+    formats = set()
+    while len(formats) < n:
+        topic = "".join(chr(c) for c in rng.integers(0x4E00, 0x9FA5, size=rng.integers(2, 6)))
+        formats.add(prefixes[rng.integers(len(prefixes))] + topic + nouns[rng.integers(len(nouns))])
+    return sorted(formats)
+
+
+def test_taxonomy_scales_to_thousands_of_unique_formats():
+    formats = synthetic_free_text_formats(5000)
+    preferred_formats = pd.Series([",".join(formats[i:i + 4]) for i in range(0, len(formats), 4)])
+    embed_fn = lambda terms: np.random.default_rng(0).normal(size=(len(terms), 64))
+
+    start = time.perf_counter()
+    taxonomy = build_format_taxonomy(preferred_formats)
+    build_format_taxonomy(preferred_formats, embed_fn)
+    elapsed = time.perf_counter() - start
+    # 逐一兩兩比對時 3,000 種格式就需要數十秒；分桶加上字首/字尾索引後應在數秒內完成
+    assert len(taxonomy) == len(formats)
+    assert elapsed < 5
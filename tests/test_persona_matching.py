@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import io
+
+import numpy as np
+import pytest
+
+from persona_data import load_persona_df
+from persona_matching import RRF_K, build_persona_index, compute_keyword_scores, fuse_scores, normalize_scores
+
+SEMANTIC = np.array([0.82, 0.40, 0.75, -0.10, 0.33])
+KEYWORD = np.array([0.0, 0.9, 0.1, 0.0, 0.45])
+
+
+def test_normalize_scores_range():
+    normalized = normalize_scores(SEMANTIC)
+    assert normalized.min() == 0 and normalized.max() == 1
+    assert normalized.argmax() == SEMANTIC.argmax()
+
+
+@pytest.mark.parametrize("value, expected", [(0.5, 1.0), (0.0, 0.0), (-0.2, 0.0)])
+def test_normalize_constant_scores(value, expected):
+    # 所有分數相同時無法區分高低：有命中視為全部滿分，否則全部為 0，且不可出現 NaN
+    normalized = normalize_scores(np.full(4, value))
+    assert normalized.tolist() == [expected] * 4
+
+
+@pytest.mark.parametrize("semantic_weight", [0.0, 0.3, 0.7, 1.0])
+def test_weighted_fusion_range(semantic_weight):
+    fused = fuse_scores(SEMANTIC, KEYWORD, "weighted", semantic_weight)
+    assert fused.min() >= 0 and fused.max() <= 1
+
+
+def test_weighted_fusion_follows_weight():
+    assert fuse_scores(SEMANTIC, KEYWORD, "weighted", 1.0).argmax() == SEMANTIC.argmax()
+    assert fuse_scores(SEMANTIC, KEYWORD, "weighted", 0.0).argmax() == KEYWORD.argmax()
+
+
+def test_weighted_fusion_with_constant_keyword_scores():
+    fused = fuse_scores(SEMANTIC, np.zeros(len(SEMANTIC)), "weighted", 0.7)
+    assert not np.isnan(fused).any()
+    assert fused.max() == pytest.approx(0.7)
+
+
+def test_rrf_fusion_range():
+    fused = fuse_scores(SEMANTIC, KEYWORD, "rrf")
+    assert fused.min() > 0 and fused.max() <= 1
+    # 倒數第一名的 Persona 分數約為 (RRF_K + 1) / (RRF_K + n)
+    assert fused.min() >= (RRF_K + 1) / (RRF_K + len(SEMANTIC))
+
+
+def test_rrf_fusion_top_rank_in_both_scores_one():
+    fused = fuse_scores(np.array([0.9, 0.1, 0.2]), np.array([0.8, 0.0, 0.3]), "rrf")
+    assert fused[0] == pytest.approx(1.0)
+    assert fused.argmax() == 0
+
+
+def test_semantic_only_ignores_keyword_scores():
+    assert fuse_scores(SEMANTIC, None, "semantic").tolist() == SEMANTIC.tolist()
+
+
+def test_keyword_scores_match_persona_terms():
+    df = load_persona_df(io.StringIO(
+        '"persona_name","summary","goals","pain_points","keywords","preferred_formats","embeddings"\n'
+        '"a","s","g","不知道怎麼給零用錢","兒童理財,零用錢","Podcast","[1, 0]"\n'
+        '"b","s","g","孩子晚上睡不好","睡眠,作息","Podcast","[0, 1]"\n'
+    ))
+    scores = compute_keyword_scores(build_persona_index(df), "兒童理財 零用錢")
+    assert scores[0] > 0 and scores[1] == 0
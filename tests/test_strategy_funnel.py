@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from strategy_funnel import (
+    FUNNEL_STAGES, build_production_checklist, create_funnel_stage_prompt, generate_funnel,
+    parse_strategy_ideas, parse_strategy_sections,
+)
+
+
+def strategy_section(name, title, media_format):
+    return f"""### **針對「{name}」的內容策略**
+
+**1. 主題與 Persona 連結分析:** {name} 的分析。
+
+**3. 內容點子與格式建議:**
+* **點子一：**
+    * **主題/標題方向:** {title}
+    * **建議格式:** {media_format}
+    * **理由:** 測試理由
+"""
+
+STRATEGY_TEXT = "\n---\n\n".join([
+    strategy_section("新手媽媽 怡君", "零用錢入門", "Podcast"),
+    strategy_section("國小老師 志明", "課堂理財遊戲", "IG圖文卡"),
+]) + "\n---\n\n### **總結：內容產製清單**\n| 內容格式 | 主題 |\n"
+
+
+class FakeModel:
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        return type("Response", (), {"text": f"階段 {len(self.prompts)}"})()
+
+
+# --- 初步策略段落解析 ---
+
+def test_sections_follow_strategy_order():
+    sections = parse_strategy_sections(STRATEGY_TEXT)
+    assert [name for name, _ in sections] == ["新手媽媽 怡君", "國小老師 志明"]
+    assert "零用錢入門" in sections[0][1]
+    # 最後的總結清單不屬於任何 Persona 的段落
+    assert all("總結" not in section for _, section in sections)
+
+
+def test_sections_without_headings_fall_back_to_whole_text():
+    assert parse_strategy_sections("  AI 未依格式輸出的策略內容\n") == [("全部 Persona", "AI 未依格式輸出的策略內容")]
+
+
+def test_personas_with_the_same_name_keep_both_sections():
+    text = strategy_section("上班族 小美", "通勤理財", "Podcast") + "\n---\n\n" + \
+        strategy_section("上班族 小美", "薪水分配", "電子報")
+    sections = parse_strategy_sections(text)
+    assert len(sections) == 2
+    assert parse_strategy_ideas(text)['title'].tolist() == ["通勤理財", "薪水分配"]
+
+    prompt = create_funnel_stage_prompt('tofu', "兒童理財", sections, [])
+    assert "通勤理財" in prompt and "薪水分配" in prompt
+
+
+def test_production_checklist_groups_titles_by_format():
+    checklist = build_production_checklist(STRATEGY_TEXT, {})
+    assert "| **Podcast** | - 零用錢入門 |" in checklist
+    assert "| **IG圖文卡** | - 課堂理財遊戲 |" in checklist
+
+
+# --- 漏斗分階段生成與快取 ---
+
+GOAL = {"name": "親子理財線上課", "action": "購買商品", "url": "https://example.com/a", "desc": ""}
+
+
+def test_only_changed_stages_are_regenerated_when_conversion_goal_changes():
+    sections = parse_strategy_sections(STRATEGY_TEXT)
+    model, cache = FakeModel(), {}
+
+    first, reused = generate_funnel(model, "兒童理財", sections, GOAL, None, cache)
+    assert reused == 0 and len(model.prompts) == len(FUNNEL_STAGES)
+
+    new_goal = dict(GOAL, url="https://example.com/b")
+    second, reused = generate_funnel(model, "兒童理財", sections, new_goal, None, cache)
+    # TOFU 與 MOFU 不含轉換目標，沿用快取；BOFU 與用戶旅程重新生成
+    assert reused == 2
+    assert second[:2] == first[:2]
+    assert len(model.prompts) == len(FUNNEL_STAGES) + 2
+    assert all("https://example.com/b" in prompt for prompt in model.prompts[-2:])
+
+
+def test_unchanged_funnel_is_served_entirely_from_cache():
+    sections = parse_strategy_sections(STRATEGY_TEXT)
+    model, cache = FakeModel(), {}
+    first, _ = generate_funnel(model, "兒童理財", sections, GOAL, None, cache)
+    second, reused = generate_funnel(model, "兒童理財", sections, GOAL, None, cache)
+    assert reused == len(FUNNEL_STAGES) and second == first
+
+
+@pytest.mark.parametrize("stage", ['tofu', 'mofu'])
+def test_conversion_goal_only_in_bofu_and_journey_prompts(stage):
+    sections = parse_strategy_sections(STRATEGY_TEXT)
+    assert GOAL['url'] not in create_funnel_stage_prompt(stage, "兒童理財", sections, [], GOAL)